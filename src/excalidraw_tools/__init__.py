@@ -1,17 +1,63 @@
 """Excalidraw diagram tools: create, edit, validate, and preview."""
 
+from __future__ import annotations
+
+import importlib
+from typing import TYPE_CHECKING, Any, List
+
 __version__ = "0.1.0"
 
-from excalidraw_tools.lib import (
-    IdFactory,
-    add_label,
-    connect,
-    load_diagram,
-    make_arrow,
-    make_shape,
-    make_text,
-    new_document,
-    save_diagram,
-)
-from excalidraw_tools.spec import diagram_to_spec, sync_spec_for_data, sync_spec_for_diagram
-from excalidraw_tools.validate import validate_document, validate_file
+# Public name -> defining module. Resolved on first attribute access so that
+# importing the package (e.g. for the CLI) does not load every submodule.
+_EXPORTS = {
+    "IdFactory": "excalidraw_tools.lib",
+    "add_label": "excalidraw_tools.lib",
+    "connect": "excalidraw_tools.lib",
+    "load_diagram": "excalidraw_tools.lib",
+    "make_arrow": "excalidraw_tools.lib",
+    "make_shape": "excalidraw_tools.lib",
+    "make_text": "excalidraw_tools.lib",
+    "new_document": "excalidraw_tools.lib",
+    "save_diagram": "excalidraw_tools.lib",
+    "diagram_to_spec": "excalidraw_tools.spec",
+    "sync_spec_for_data": "excalidraw_tools.spec",
+    "sync_spec_for_diagram": "excalidraw_tools.spec",
+    "validate_document": "excalidraw_tools.validate",
+    "validate_file": "excalidraw_tools.validate",
+}
+
+# Submodules the eager package import used to load, so `excalidraw_tools.spec`
+# and friends keep working after a bare `import excalidraw_tools`.
+_SUBMODULES = ("lib", "spec", "validate")
+
+__all__ = ["__version__", *_EXPORTS]
+
+if TYPE_CHECKING:
+    from excalidraw_tools.lib import (
+        IdFactory,
+        add_label,
+        connect,
+        load_diagram,
+        make_arrow,
+        make_shape,
+        make_text,
+        new_document,
+        save_diagram,
+    )
+    from excalidraw_tools.spec import diagram_to_spec, sync_spec_for_data, sync_spec_for_diagram
+    from excalidraw_tools.validate import validate_document, validate_file
+
+
+def __getattr__(name: str) -> Any:
+    if name in _SUBMODULES:
+        return importlib.import_module(f"{__name__}.{name}")
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> List[str]:
+    return sorted(set(globals()) | set(_EXPORTS) | set(_SUBMODULES))
@@ -3,32 +3,44 @@
 from __future__ import annotations
 
 import argparse
+import importlib
 import sys
-from typing import Sequence
+from typing import Optional, Sequence
+
+# name -> (module, help). Modules are imported only when their subcommand runs.
+SUBCOMMANDS = {
+    "build": ("excalidraw_tools.build", "Build a new .excalidraw file from a spec JSON"),
+    "edit": ("excalidraw_tools.edit", "Edit an existing .excalidraw file"),
+    "validate": ("excalidraw_tools.validate", "Validate .excalidraw JSON files"),
+    "preview": ("excalidraw_tools.preview", "Render approximate PNG preview (matplotlib)"),
+    "sync-spec": ("excalidraw_tools.sync_spec", "Derive/update a .spec.json from an .excalidraw file"),
+    "golden-check": ("excalidraw_tools.golden_check", "Run regression checks against golden fixture"),
+}
+
+
+def _sniff_subcommand(argv: Sequence[str]) -> Optional[str]:
+    if argv and argv[0] in SUBCOMMANDS:
+        return argv[0]
+    return None
 
 
 def main(argv: Sequence[str] | None = None) -> int:
+    argv = list(argv if argv is not None else sys.argv[1:])
     parser = argparse.ArgumentParser(
         prog="excalidraw-tools",
         description="Create, edit, validate, and preview Excalidraw diagrams.",
     )
     sub = parser.add_subparsers(dest="command")
 
-    from excalidraw_tools.build import add_subparser as add_build
-    from excalidraw_tools.edit import add_subparser as add_edit
-    from excalidraw_tools.sync_spec import add_subparser as add_sync_spec
-    from excalidraw_tools.validate import add_subparser as add_validate
-    from excalidraw_tools.preview import add_subparser as add_preview
-    from excalidraw_tools.golden_check import add_subparser as add_golden_check
-
-    add_build(sub)
-    add_edit(sub)
-    add_validate(sub)
-    add_preview(sub)
-    add_sync_spec(sub)
-    add_golden_check(sub)
-
-    args = parser.parse_args(argv if argv is not None else sys.argv[1:])
+    command = _sniff_subcommand(argv)
+    if command is not None:
+        module = importlib.import_module(SUBCOMMANDS[command][0])
+        module.add_subparser(sub)
+    else:
+        for name, (_, help_text) in SUBCOMMANDS.items():
+            sub.add_parser(name, help=help_text)
+
+    args = parser.parse_args(argv)
     if args.command is None:
         parser.print_help()
         return 1
@@ -0,0 +1,38 @@
+"""JSON encoding/decoding that prefers orjson when it is installed."""
+
+from __future__ import annotations
+
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on environment
+    orjson = None
+
+import json
+
+
+def loads(raw: bytes | str) -> Any:
+    """Decode JSON from raw file bytes (or text) with the fastest available parser.
+
+    With orjson, integers wider than 64 bits decode as floats and lose precision.
+    """
+    if orjson is not None:
+        try:
+            return orjson.loads(raw)
+        except orjson.JSONDecodeError:
+            # orjson is stricter than stdlib json (NaN/Infinity literals, lone
+            # surrogate escapes); accept whatever stdlib json accepts.
+            pass
+    return json.loads(raw)
+
+
+def dumps_pretty(data: Any) -> bytes:
+    """Encode as UTF-8 JSON with 2-space indentation and a trailing newline."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_APPEND_NEWLINE)
+        except orjson.JSONEncodeError:
+            # e.g. ints wider than 64 bits, which the stdlib encoder handles.
+            pass
+    return (json.dumps(data, indent=2) + "\n").encode("utf-8")
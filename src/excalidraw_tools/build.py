@@ -4,12 +4,21 @@
 from __future__ import annotations
 
 import argparse
-import json
 import sys
 from pathlib import Path
-from typing import Any, Dict, List, Sequence
-
-from excalidraw_tools.lib import IdFactory, add_label, connect, make_shape, make_text, new_document, save_diagram
+from typing import Any, Dict, List
+
+from excalidraw_tools._json import loads
+from excalidraw_tools.lib import (
+    IdFactory,
+    add_label,
+    connect,
+    make_shape,
+    make_text,
+    new_document,
+    now_ms,
+    save_diagram,
+)
 from excalidraw_tools.spec import resolve_spec_path, sync_spec_for_data
 
 VALID_SHAPES = {"rectangle", "ellipse", "diamond"}
@@ -17,7 +26,7 @@ VALID_SHAPES = {"rectangle", "ellipse", "diamond"}
 
 def _load_spec(path: Path) -> Dict[str, Any]:
     try:
-        return json.loads(path.read_text(encoding="utf-8"))
+        return loads(path.read_bytes())
     except Exception as exc:
         raise ValueError(f"failed to parse spec JSON: {exc}") from exc
 
@@ -50,6 +59,10 @@ def build(spec: Dict[str, Any]) -> Dict[str, Any]:
     elements: List[Dict[str, Any]] = []
     ids = IdFactory(seed=spec.get("seed", 42), start_index=0)
     aliases: Dict[str, Dict[str, Any]] = {}
+    default_roughness = style["roughness"]
+    default_font_family = style["fontFamily"]
+    updated = spec.get("updated")
+    ts = int(updated) if updated is not None else now_ms()
 
     for idx, node in enumerate(nodes):
         alias = node.get("id")
@@ -70,7 +83,7 @@ def build(spec: Dict[str, Any]) -> Dict[str, Any]:
         background = str(node.get("background", "transparent"))
         stroke_width = int(node.get("strokeWidth", 2))
         stroke_style = str(node.get("strokeStyle", "solid"))
-        roughness = int(node.get("roughness", style["roughness"]))
+        roughness = int(node.get("roughness", default_roughness))
 
         shape = make_shape(
             elements,
@@ -86,6 +99,7 @@ def build(spec: Dict[str, Any]) -> Dict[str, Any]:
             stroke_style=stroke_style,
             roughness=roughness,
             element_id=alias,
+            ts=ts,
         )
         aliases[alias] = shape
 
@@ -97,7 +111,8 @@ def build(spec: Dict[str, Any]) -> Dict[str, Any]:
                 shape,
                 str(label),
                 font_size=int(node.get("fontSize", 20)),
-                font_family=int(node.get("fontFamily", style["fontFamily"])),
+                font_family=int(node.get("fontFamily", default_font_family)),
+                ts=ts,
             )
 
     for idx, edge in enumerate(edges):
@@ -108,6 +123,7 @@ def build(spec: Dict[str, Any]) -> Dict[str, Any]:
         if not isinstance(dst, str) or dst not in aliases:
             raise ValueError(f"edges[{idx}].to references unknown node: {dst}")
 
+        edge_stroke = str(edge.get("stroke", "#1e1e1e"))
         arrow = connect(
             elements,
             ids,
@@ -115,8 +131,9 @@ def build(spec: Dict[str, Any]) -> Dict[str, Any]:
             aliases[dst],
             source_edge=str(edge.get("fromEdge", "bottom")),
             target_edge=str(edge.get("toEdge", "top")),
-            stroke=str(edge.get("stroke", "#1e1e1e")),
+            stroke=edge_stroke,
             elbowed=bool(edge.get("elbowed", False)),
+            ts=ts,
         )
 
         edge_label = edge.get("label")
@@ -134,16 +151,11 @@ def build(spec: Dict[str, Any]) -> Dict[str, Any]:
                 20,
                 container_id=None,
                 font_size=int(edge.get("fontSize", 14)),
-                font_family=int(edge.get("fontFamily", style["fontFamily"])),
-                stroke=str(edge.get("stroke", "#1e1e1e")),
+                font_family=int(edge.get("fontFamily", default_font_family)),
+                stroke=edge_stroke,
+                ts=ts,
             )
 
-    updated = spec.get("updated")
-    if updated is not None:
-        updated_ts = int(updated)
-        for elem in elements:
-            elem["updated"] = updated_ts
-
     return new_document(elements)
 
 
@@ -5,8 +5,9 @@ from __future__ import annotations
 
 import argparse
 import sys
+from collections import defaultdict
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Sequence, Tuple
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
 
 from excalidraw_tools.lib import (
     IdFactory,
@@ -17,62 +18,92 @@ from excalidraw_tools.lib import (
     make_text,
     move_shape_and_dependents,
     new_document,
+    now_ms,
     save_diagram,
     touch,
 )
 from excalidraw_tools.spec import resolve_spec_path, sync_spec_for_data
 
 
-def _build_factory(elements: List[Dict[str, Any]]) -> IdFactory:
-    existing_ids = [elem.get("id") for elem in elements if isinstance(elem, dict) and "id" in elem]
-    return IdFactory(start_index=len(elements), existing_ids=existing_ids)
+class _ElementIndex(NamedTuple):
+    """Lookups over the live elements of a diagram, built in a single pass."""
 
+    ids: List[str]
+    texts: List[Tuple[Dict[str, Any], str]]
+    by_id: Dict[str, Dict[str, Any]]
+    by_container: Dict[str, List[Dict[str, Any]]]
+    by_binding: Dict[str, List[Dict[str, Any]]]
 
-def _match_text(elements: List[Dict[str, Any]], label: str) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
-    label_norm = label.lower().strip()
 
-    exact_shape = None
-    exact_text = None
-    partial_shape = None
-    partial_text = None
+def _index_elements(elements: List[Dict[str, Any]]) -> _ElementIndex:
+    ids: List[str] = []
+    texts: List[Tuple[Dict[str, Any], str]] = []
+    by_id: Dict[str, Dict[str, Any]] = {}
+    by_container: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    by_binding: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
 
     for elem in elements:
-        if not isinstance(elem, dict) or elem.get("isDeleted") or elem.get("type") != "text":
+        if type(elem) is not dict:
             continue
-        text_value = str(elem.get("text", "")).strip()
-        if not text_value:
+        get = elem.get
+        elem_id = get("id")
+        if elem_id is not None:
+            # Deleted elements still own their ids, so the factory must avoid them.
+            ids.append(elem_id)
+        if get("isDeleted"):
             continue
+        if elem_id is not None:
+            by_id[elem_id] = elem
+
+        etype = get("type")
+        if etype == "text":
+            text_lower = str(get("text", "")).strip().lower()
+            if text_lower:
+                texts.append((elem, text_lower))
+            container_id = get("containerId")
+            if container_id:
+                by_container[container_id].append(elem)
+        elif etype == "arrow":
+            start_binding = get("startBinding")
+            end_binding = get("endBinding")
+            start_id = start_binding.get("elementId") if start_binding else None
+            end_id = end_binding.get("elementId") if end_binding else None
+            if start_id:
+                by_binding[start_id].append(elem)
+            if end_id and end_id != start_id:
+                by_binding[end_id].append(elem)
+
+    return _ElementIndex(ids, texts, by_id, by_container, by_binding)
+
+
+def _build_factory(elements: List[Dict[str, Any]], index: Optional[_ElementIndex] = None) -> IdFactory:
+    if index is not None:
+        existing_ids = index.ids
+    else:
+        existing_ids = [elem.get("id") for elem in elements if isinstance(elem, dict) and "id" in elem]
+    return IdFactory(start_index=len(elements), existing_ids=existing_ids)
+
+
+def _match_text(index: _ElementIndex, label: str) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    label_norm = label.lower().strip()
+    by_id = index.by_id
+
+    # Exact matches win, so look for one before paying for substring checks.
+    for elem, text_lower in index.texts:
+        if text_lower == label_norm:
+            container_id = elem.get("containerId")
+            return (by_id.get(container_id) if container_id else None), elem
+
+    for elem, text_lower in index.texts:
+        if label_norm in text_lower:
+            container_id = elem.get("containerId")
+            return (by_id.get(container_id) if container_id else None), elem
+
+    return None, None
 
-        container_id = elem.get("containerId")
-        container = None
-        if container_id:
-            container = next(
-                (
-                    candidate
-                    for candidate in elements
-                    if isinstance(candidate, dict)
-                    and candidate.get("id") == container_id
-                    and not candidate.get("isDeleted")
-                ),
-                None,
-            )
-
-        if text_value.lower() == label_norm:
-            exact_shape = container
-            exact_text = elem
-            break
-
-        if label_norm in text_value.lower() and partial_text is None:
-            partial_shape = container
-            partial_text = elem
-
-    if exact_text is not None:
-        return exact_shape, exact_text
-    return partial_shape, partial_text
-
-
-def _required_shape_by_label(elements: List[Dict[str, Any]], label: str) -> Dict[str, Any]:
-    shape, text = _match_text(elements, label)
+
+def _required_shape_by_label(index: _ElementIndex, label: str) -> Dict[str, Any]:
+    shape, text = _match_text(index, label)
     if text is None:
         raise ValueError(f"could not find label: {label}")
     if shape is None:
@@ -80,8 +111,8 @@ def _required_shape_by_label(elements: List[Dict[str, Any]], label: str) -> Dict
     return shape
 
 
-def _required_text_by_label(elements: List[Dict[str, Any]], label: str) -> Dict[str, Any]:
-    _, text = _match_text(elements, label)
+def _required_text_by_label(index: _ElementIndex, label: str) -> Dict[str, Any]:
+    _, text = _match_text(index, label)
     if text is None:
         raise ValueError(f"could not find label: {label}")
     return text
@@ -102,10 +133,11 @@ def _sync_spec_if_requested(data: Dict[str, Any], diagram_path: Path, sync_spec:
 def cmd_move(args: argparse.Namespace) -> int:
     data = load_diagram(args.input)
     elements = data.get("elements", [])
-    factory = _build_factory(elements)
+    index = _index_elements(elements)
+    factory = _build_factory(elements, index)
 
-    shape = _required_shape_by_label(elements, args.label)
-    move_shape_and_dependents(data, shape, args.dx, args.dy, factory)
+    shape = _required_shape_by_label(index, args.label)
+    move_shape_and_dependents(data, shape, args.dx, args.dy, factory, id_index=index.by_id)
 
     out = _output_path(args.input, args.output)
     save_diagram(out, data)
@@ -120,9 +152,10 @@ def cmd_move(args: argparse.Namespace) -> int:
 def cmd_relabel(args: argparse.Namespace) -> int:
     data = load_diagram(args.input)
     elements = data.get("elements", [])
-    factory = _build_factory(elements)
+    index = _index_elements(elements)
+    factory = _build_factory(elements, index)
 
-    text_elem = _required_text_by_label(elements, args.label)
+    text_elem = _required_text_by_label(index, args.label)
     text_elem["text"] = args.text
     text_elem["originalText"] = args.text
     touch(text_elem, factory)
@@ -140,29 +173,22 @@ def cmd_relabel(args: argparse.Namespace) -> int:
 def cmd_recolor(args: argparse.Namespace) -> int:
     data = load_diagram(args.input)
     elements = data.get("elements", [])
-    factory = _build_factory(elements)
+    index = _index_elements(elements)
+    factory = _build_factory(elements, index)
 
-    shape = _required_shape_by_label(elements, args.label)
+    shape = _required_shape_by_label(index, args.label)
     if args.stroke:
         shape["strokeColor"] = args.stroke
     if args.background:
         shape["backgroundColor"] = args.background
-    touch(shape, factory)
-
-    text_label = next(
-        (
-            elem
-            for elem in elements
-            if isinstance(elem, dict)
-            and not elem.get("isDeleted")
-            and elem.get("type") == "text"
-            and elem.get("containerId") == shape.get("id")
-        ),
-        None,
-    )
+    ts = now_ms()
+    touch(shape, factory, ts)
+
+    container_texts = index.by_container.get(shape.get("id"))
+    text_label = container_texts[0] if container_texts else None
     if text_label and args.stroke:
         text_label["strokeColor"] = args.stroke
-        touch(text_label, factory)
+        touch(text_label, factory, ts)
 
     out = _output_path(args.input, args.output)
     save_diagram(out, data)
@@ -177,46 +203,27 @@ def cmd_recolor(args: argparse.Namespace) -> int:
 def cmd_delete(args: argparse.Namespace) -> int:
     data = load_diagram(args.input)
     elements = data.get("elements", [])
-    factory = _build_factory(elements)
+    index = _index_elements(elements)
+    factory = _build_factory(elements, index)
 
-    shape, text = _match_text(elements, args.label)
+    shape, text = _match_text(index, args.label)
     if text is None:
         raise ValueError(f"could not find label: {args.label}")
 
     targets: List[Dict[str, Any]] = []
     if shape is not None:
         targets.append(shape)
-        targets.extend(
-            [
-                elem
-                for elem in elements
-                if isinstance(elem, dict)
-                and not elem.get("isDeleted")
-                and elem.get("type") == "text"
-                and elem.get("containerId") == shape.get("id")
-            ]
-        )
-        targets.extend(
-            [
-                elem
-                for elem in elements
-                if isinstance(elem, dict)
-                and not elem.get("isDeleted")
-                and elem.get("type") == "arrow"
-                and (
-                    (elem.get("startBinding") or {}).get("elementId") == shape.get("id")
-                    or (elem.get("endBinding") or {}).get("elementId") == shape.get("id")
-                )
-            ]
-        )
+        targets.extend(index.by_container.get(shape.get("id"), []))
+        targets.extend(index.by_binding.get(shape.get("id"), []))
     else:
         targets.append(text)
 
+    ts = now_ms()
     for elem in targets:
         if elem.get("isDeleted"):
             continue
         elem["isDeleted"] = True
-        touch(elem, factory)
+        touch(elem, factory, ts)
 
     out = _output_path(args.input, args.output)
     save_diagram(out, data)
@@ -229,7 +236,10 @@ def cmd_delete(args: argparse.Namespace) -> int:
 
 
 def cmd_add_box(args: argparse.Namespace) -> int:
-    data = load_diagram(args.input) if args.input.exists() else {"elements": []}
+    try:
+        data = load_diagram(args.input)
+    except FileNotFoundError:
+        data = {"elements": []}
     if "elements" not in data:
         data["elements"] = []
 
@@ -238,6 +248,7 @@ def cmd_add_box(args: argparse.Namespace) -> int:
 
     elements = data["elements"]
     factory = _build_factory(elements)
+    ts = now_ms()
 
     shape = make_shape(
         elements,
@@ -251,8 +262,9 @@ def cmd_add_box(args: argparse.Namespace) -> int:
         background=args.background,
         stroke_style="dashed" if args.dashed else "solid",
         roughness=0 if args.crisp else 1,
+        ts=ts,
     )
-    add_label(elements, factory, shape, args.label, font_size=args.font_size, font_family=args.font_family)
+    add_label(elements, factory, shape, args.label, font_size=args.font_size, font_family=args.font_family, ts=ts)
 
     out = _output_path(args.input, args.output)
     save_diagram(out, data)
@@ -267,10 +279,12 @@ def cmd_add_box(args: argparse.Namespace) -> int:
 def cmd_connect(args: argparse.Namespace) -> int:
     data = load_diagram(args.input)
     elements = data.get("elements", [])
-    factory = _build_factory(elements)
+    index = _index_elements(elements)
+    factory = _build_factory(elements, index)
 
-    source = _required_shape_by_label(elements, args.from_label)
-    target = _required_shape_by_label(elements, args.to_label)
+    source = _required_shape_by_label(index, args.from_label)
+    target = _required_shape_by_label(index, args.to_label)
+    ts = now_ms()
 
     arrow = connect(
         elements,
@@ -281,6 +295,7 @@ def cmd_connect(args: argparse.Namespace) -> int:
         target_edge=args.to_edge,
         stroke=args.stroke,
         elbowed=args.elbowed,
+        ts=ts,
     )
 
     if args.label:
@@ -299,6 +314,7 @@ def cmd_connect(args: argparse.Namespace) -> int:
             font_size=args.font_size,
             font_family=args.font_family,
             stroke=args.stroke,
+            ts=ts,
         )
 
     out = _output_path(args.input, args.output)
@@ -3,20 +3,29 @@
 
 from __future__ import annotations
 
-import json
 import random
 import time
 from pathlib import Path
-from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+from types import MappingProxyType
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple
 
-INDEX_CHARS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+from excalidraw_tools import _json
 
-DEFAULT_APP_STATE = {
-    "gridSize": 20,
-    "gridStep": 5,
-    "gridModeEnabled": False,
-    "viewBackgroundColor": "#ffffff",
-}
+INDEX_CHARS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+ID_CHARS = "abcdefghijklmnopqrstuvwxyz0123456789"
+ID_LENGTH = 12
+# random.Random.choice draws indexes by rejection sampling over this many bits.
+_ID_BITS = len(ID_CHARS).bit_length()
+
+# Read-only, with scalar values only, so new_document's shallow dict() copy is enough.
+DEFAULT_APP_STATE: Mapping[str, Any] = MappingProxyType(
+    {
+        "gridSize": 20,
+        "gridStep": 5,
+        "gridModeEnabled": False,
+        "viewBackgroundColor": "#ffffff",
+    }
+)
 
 BASE_REQUIRED_FIELDS = {
     "id",
@@ -75,6 +84,37 @@ ROUNDNESS_BY_TYPE = {
     "line": {"type": 2},
 }
 
+# Key order and constant defaults for make_shape; per-element fields are None
+# placeholders. Mutable fields (groupIds, boundElements) get fresh lists per copy.
+_SHAPE_TEMPLATE: Dict[str, Any] = {
+    "id": None,
+    "type": None,
+    "x": 0,
+    "y": 0,
+    "width": 0,
+    "height": 0,
+    "angle": 0,
+    "strokeColor": None,
+    "backgroundColor": None,
+    "fillStyle": "solid",
+    "strokeWidth": None,
+    "strokeStyle": None,
+    "roughness": None,
+    "opacity": 100,
+    "groupIds": None,
+    "frameId": None,
+    "index": None,
+    "roundness": None,
+    "seed": None,
+    "version": 1,
+    "versionNonce": None,
+    "isDeleted": False,
+    "boundElements": None,
+    "updated": None,
+    "link": None,
+    "locked": False,
+}
+
 EDGE_TO_FIXED_POINT = {
     "top": [0.5, 0],
     "bottom": [0.5, 1],
@@ -91,7 +131,7 @@ FIXED_POINT_TO_EDGE = {
 
 
 def now_ms() -> int:
-    return int(time.time() * 1000)
+    return time.time_ns() // 1_000_000
 
 
 def index_for_rank(rank: int) -> str:
@@ -131,9 +171,21 @@ class IdFactory:
         return self._rng.randint(1, (2**31) - 1)
 
     def random_id(self, prefix: str = "el") -> str:
+        # Same rejection sampling as rng.choice(ID_CHARS), so ids for a given seed
+        # must not change.
+        getrandbits = self._rng.getrandbits
+        alphabet = ID_CHARS
+        n = len(alphabet)
+        k = _ID_BITS
         while True:
-            suffix = "".join(self._rng.choice("abcdefghijklmnopqrstuvwxyz0123456789") for _ in range(12))
-            value = f"{prefix}-{suffix}"
+            chars = []
+            append = chars.append
+            for _ in range(ID_LENGTH):
+                r = getrandbits(k)
+                while r >= n:
+                    r = getrandbits(k)
+                append(alphabet[r])
+            value = f"{prefix}-{''.join(chars)}"
             if value not in self._ids:
                 self._ids.add(value)
                 return value
@@ -156,23 +208,28 @@ def new_document(elements: Optional[List[Dict[str, Any]]] = None) -> Dict[str, A
 
 
 def load_diagram(path: str | Path) -> Dict[str, Any]:
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
+    return _json.loads(Path(path).read_bytes())
 
 
 def save_diagram(path: str | Path, data: Dict[str, Any]) -> None:
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2)
-        f.write("\n")
+    Path(path).write_bytes(_json.dumps_pretty(data))
+
+
+_default_factory: Optional[IdFactory] = None
+
+
+def _get_default_factory() -> IdFactory:
+    """Unseeded factory shared by callers of touch() that do not supply one."""
+    global _default_factory
+    if _default_factory is None:
+        _default_factory = IdFactory()
+    return _default_factory
 
 
 def touch(element: Dict[str, Any], factory: Optional[IdFactory] = None, ts: Optional[int] = None) -> None:
     element["updated"] = ts if ts is not None else now_ms()
     element["version"] = int(element.get("version", 1)) + 1
-    if factory is None:
-        element["versionNonce"] = random.randint(1, (2**31) - 1)
-    else:
-        element["versionNonce"] = factory.nonce()
+    element["versionNonce"] = (factory or _get_default_factory()).nonce()
 
 
 def normalize_bound_elements(element: Dict[str, Any]) -> List[Dict[str, str]]:
@@ -198,6 +255,7 @@ def make_shape(
     stroke_style: str = "solid",
     roughness: int = 1,
     element_id: Optional[str] = None,
+    ts: Optional[int] = None,
 ) -> Dict[str, Any]:
     if etype == "arrow":
         roundness = {"type": 2}
@@ -207,34 +265,26 @@ def make_shape(
     if element_id is not None:
         ids.reserve_id(element_id)
 
-    elem = {
-        "id": element_id if element_id is not None else ids.random_id(),
-        "type": etype,
-        "x": x,
-        "y": y,
-        "width": width,
-        "height": height,
-        "angle": 0,
-        "strokeColor": stroke,
-        "backgroundColor": background,
-        "fillStyle": "solid",
-        "strokeWidth": stroke_width,
-        "strokeStyle": stroke_style,
-        "roughness": roughness,
-        "opacity": 100,
-        "groupIds": [],
-        "frameId": None,
-        "index": ids.next_index(),
-        "roundness": roundness,
-        "seed": ids.nonce(),
-        "version": 1,
-        "versionNonce": ids.nonce(),
-        "isDeleted": False,
-        "boundElements": [],
-        "updated": now_ms(),
-        "link": None,
-        "locked": False,
-    }
+    # RNG calls must stay in id, index, seed, versionNonce order.
+    elem = _SHAPE_TEMPLATE.copy()
+    elem["id"] = element_id if element_id is not None else ids.random_id()
+    elem["type"] = etype
+    elem["x"] = x
+    elem["y"] = y
+    elem["width"] = width
+    elem["height"] = height
+    elem["strokeColor"] = stroke
+    elem["backgroundColor"] = background
+    elem["strokeWidth"] = stroke_width
+    elem["strokeStyle"] = stroke_style
+    elem["roughness"] = roughness
+    elem["groupIds"] = []
+    elem["index"] = ids.next_index()
+    elem["roundness"] = roundness
+    elem["seed"] = ids.nonce()
+    elem["versionNonce"] = ids.nonce()
+    elem["boundElements"] = []
+    elem["updated"] = ts if ts is not None else now_ms()
     elements.append(elem)
     return elem
 
@@ -252,6 +302,7 @@ def make_text(
     font_size: int = 20,
     font_family: int = 1,
     stroke: str = "#1e1e1e",
+    ts: Optional[int] = None,
 ) -> Dict[str, Any]:
     text = make_shape(
         elements,
@@ -263,6 +314,7 @@ def make_text(
         height,
         stroke=stroke,
         background="transparent",
+        ts=ts,
     )
     text["roundness"] = None
     text.update(
@@ -289,6 +341,7 @@ def add_label(
     font_size: int = 20,
     font_family: int = 1,
     text_height: int = 25,
+    ts: Optional[int] = None,
 ) -> Dict[str, Any]:
     text_width = shape["width"] - 10
     text_x = shape["x"] + 5
@@ -305,46 +358,69 @@ def add_label(
         font_size=font_size,
         font_family=font_family,
         stroke=shape.get("strokeColor", "#1e1e1e"),
+        ts=ts,
     )
     normalize_bound_elements(shape).append({"id": text["id"], "type": "text"})
     return text
 
 
 def edge_point(shape: Dict[str, Any], edge: str) -> Tuple[float, float]:
-    x = float(shape["x"])
-    y = float(shape["y"])
-    width = float(shape["width"])
-    height = float(shape["height"])
+    try:
+        fx, fy = EDGE_TO_FIXED_POINT[edge]
+    except KeyError:
+        raise ValueError(f"unsupported edge: {edge}") from None
+    return float(shape["x"]) + float(shape["width"]) * fx, float(shape["y"]) + float(shape["height"]) * fy
+
+
+def _route_vertical(dx: float, dy: float) -> List[List[float]]:
+    return [[0, 0], [0, dy]] if abs(dx) < 10 else [[0, 0], [dx, 0], [dx, dy]]
+
+
+def _route_horizontal(dx: float, dy: float) -> List[List[float]]:
+    return [[0, 0], [dx, 0]] if abs(dy) < 10 else [[0, 0], [0, dy], [dx, dy]]
 
-    if edge == "top":
-        return x + width / 2, y
-    if edge == "bottom":
-        return x + width / 2, y + height
-    if edge == "left":
-        return x, y + height / 2
-    if edge == "right":
-        return x + width, y + height / 2
-    raise ValueError(f"unsupported edge: {edge}")
+
+def _route_across_then_down(dx: float, dy: float) -> List[List[float]]:
+    return [[0, 0], [dx, 0], [dx, dy]]
+
+
+# (source_edge, target_edge) -> router; other pairs get a straight segment.
+ROUTES_BY_EDGES = {
+    ("bottom", "top"): _route_vertical,
+    ("right", "left"): _route_horizontal,
+    ("right", "top"): _route_across_then_down,
+    ("left", "right"): _route_horizontal,
+}
 
 
 def route_points(source_edge: str, target_edge: str, dx: float, dy: float) -> List[List[float]]:
-    if source_edge == "bottom" and target_edge == "top":
-        return [[0, 0], [0, dy]] if abs(dx) < 10 else [[0, 0], [dx, 0], [dx, dy]]
-    if source_edge == "right" and target_edge == "left":
-        return [[0, 0], [dx, 0]] if abs(dy) < 10 else [[0, 0], [0, dy], [dx, dy]]
-    if source_edge == "right" and target_edge == "top":
-        return [[0, 0], [dx, 0], [dx, dy]]
-    if source_edge == "left" and target_edge == "right":
-        return [[0, 0], [dx, 0]] if abs(dy) < 10 else [[0, 0], [0, dy], [dx, dy]]
-    return [[0, 0], [dx, dy]]
+    route = ROUTES_BY_EDGES.get((source_edge, target_edge))
+    if route is None:
+        return [[0, 0], [dx, dy]]
+    return route(dx, dy)
+
+
+def _points_extent(points: Sequence[Sequence[float]]) -> Tuple[float, float]:
+    """Return (width, height) spanned by relative points, in a single pass."""
+    min_x = max_x = points[0][0]
+    min_y = max_y = points[0][1]
+    for point in points:
+        px = point[0]
+        py = point[1]
+        if px < min_x:
+            min_x = px
+        elif px > max_x:
+            max_x = px
+        if py < min_y:
+            min_y = py
+        elif py > max_y:
+            max_y = py
+    return max(abs(min_x), abs(max_x)), max(abs(min_y), abs(max_y))
 
 
 def recalc_arrow_bounds(arrow: Dict[str, Any]) -> None:
     points = arrow.get("points") or [[0, 0]]
-    xs = [p[0] for p in points]
-    ys = [p[1] for p in points]
-    arrow["width"] = max(abs(min(xs)), abs(max(xs)))
-    arrow["height"] = max(abs(min(ys)), abs(max(ys)))
+    arrow["width"], arrow["height"] = _points_extent(points)
 
 
 def make_arrow(
@@ -361,6 +437,7 @@ def make_arrow(
     elbowed: bool = False,
     source_edge: Optional[str] = None,
     target_edge: Optional[str] = None,
+    ts: Optional[int] = None,
 ) -> Dict[str, Any]:
     arrow = make_shape(
         elements,
@@ -373,12 +450,16 @@ def make_arrow(
         stroke=stroke,
         stroke_width=stroke_width,
         roughness=0 if elbowed else 1,
+        ts=ts,
     )
     arrow["roundness"] = None if elbowed else {"type": 2}
 
     point_list = [[float(px), float(py)] for px, py in points]
     arrow["points"] = point_list
-    recalc_arrow_bounds(arrow)
+    if point_list:
+        arrow["width"], arrow["height"] = _points_extent(point_list)
+    else:
+        recalc_arrow_bounds(arrow)
 
     start_binding = None
     end_binding = None
@@ -413,6 +494,7 @@ def connect(
     target_edge: str = "top",
     stroke: str = "#1e1e1e",
     elbowed: bool = False,
+    ts: Optional[int] = None,
 ) -> Dict[str, Any]:
     sx, sy = edge_point(source, source_edge)
     tx, ty = edge_point(target, target_edge)
@@ -432,6 +514,7 @@ def connect(
         elbowed=elbowed,
         source_edge=source_edge,
         target_edge=target_edge,
+        ts=ts,
     )
 
     normalize_bound_elements(source).append({"id": arrow["id"], "type": "arrow"})
@@ -443,15 +526,19 @@ def active_elements(elements: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
     return [elem for elem in elements if not elem.get("isDeleted")]
 
 
+def iter_active(elements: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    """Lazy active_elements for callers that only scan until the first match."""
+    return (elem for elem in elements if not elem.get("isDeleted"))
+
+
 def build_id_index(elements: Sequence[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
     return {elem["id"]: elem for elem in elements if isinstance(elem, dict) and "id" in elem}
 
 
 def find_by_label(elements: Sequence[Dict[str, Any]], label: str) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
     label_norm = label.lower()
-    id_index = build_id_index(elements)
 
-    for elem in active_elements(elements):
+    for elem in iter_active(elements):
         if elem.get("type") != "text":
             continue
         text = str(elem.get("text", ""))
@@ -459,14 +546,23 @@ def find_by_label(elements: Sequence[Dict[str, Any]], label: str) -> Tuple[Optio
             continue
         container_id = elem.get("containerId")
         if container_id:
-            return id_index.get(container_id), elem
+            # Scan from the end so duplicate ids resolve as build_id_index would.
+            container = next(
+                (
+                    candidate
+                    for candidate in reversed(elements)
+                    if isinstance(candidate, dict) and candidate.get("id") == container_id
+                ),
+                None,
+            )
+            return container, elem
         return None, elem
 
     return None, None
 
 
 def text_for_container(elements: Sequence[Dict[str, Any]], container_id: str) -> Optional[Dict[str, Any]]:
-    for elem in active_elements(elements):
+    for elem in iter_active(elements):
         if elem.get("type") == "text" and elem.get("containerId") == container_id:
             return elem
     return None
@@ -490,12 +586,27 @@ def infer_edge_from_fixed_point(binding: Dict[str, Any]) -> Optional[str]:
 
 def infer_edge_by_proximity(shape: Dict[str, Any], point: Tuple[float, float]) -> str:
     px, py = point
-    distances = []
-    for edge in ("top", "bottom", "left", "right"):
-        ex, ey = edge_point(shape, edge)
-        distances.append((abs(px - ex) + abs(py - ey), edge))
-    distances.sort(key=lambda item: item[0])
-    return distances[0][1]
+    x = float(shape["x"])
+    y = float(shape["y"])
+    width = float(shape["width"])
+    height = float(shape["height"])
+    cx = x + width / 2
+    cy = y + height / 2
+
+    # Manhattan distance to each edge midpoint (as edge_point computes them);
+    # ties go to the earlier edge in top/bottom/left/right order.
+    edge = "top"
+    best = abs(px - cx) + abs(py - y)
+    dist = abs(px - cx) + abs(py - (y + height))
+    if dist < best:
+        edge, best = "bottom", dist
+    dist = abs(px - x) + abs(py - cy)
+    if dist < best:
+        edge, best = "left", dist
+    dist = abs(px - (x + width)) + abs(py - cy)
+    if dist < best:
+        edge = "right"
+    return edge
 
 
 def reroute_arrow(arrow: Dict[str, Any], id_index: Dict[str, Dict[str, Any]]) -> bool:
@@ -564,41 +675,51 @@ def move_shape_and_dependents(
     dx: float,
     dy: float,
     ids: Optional[IdFactory] = None,
+    ts: Optional[int] = None,
+    id_index: Optional[Dict[str, Dict[str, Any]]] = None,
 ) -> None:
+    """Move ``shape`` with its label and arrows.
+
+    Callers applying several edits to one document can pass a prebuilt
+    ``id_index`` (see ``build_id_index``) to avoid re-indexing per call.
+    """
     elements = data.get("elements", [])
-    id_index = build_id_index(elements)
+    if id_index is None:
+        id_index = build_id_index(elements)
     moved_arrow_ids = set()
+    # One logical edit: the shape, its label, and its arrows share a timestamp.
+    ts = ts if ts is not None else now_ms()
 
     shape["x"] = float(shape.get("x", 0)) + dx
     shape["y"] = float(shape.get("y", 0)) + dy
-    touch(shape, ids)
+    touch(shape, ids, ts)
 
     label = text_for_container(elements, shape["id"])
     if label:
         label["x"] = float(label.get("x", 0)) + dx
         label["y"] = float(label.get("y", 0)) + dy
-        touch(label, ids)
-
-    for arrow in active_elements(elements):
-        if arrow.get("type") != "arrow":
-            continue
-
-        start_binding = arrow.get("startBinding") or {}
-        end_binding = arrow.get("endBinding") or {}
-        start_match = start_binding.get("elementId") == shape.get("id")
-        end_match = end_binding.get("elementId") == shape.get("id")
-
-        if start_match or end_match:
-            if reroute_arrow(arrow, id_index):
-                touch(arrow, ids)
-                moved_arrow_ids.add(arrow["id"])
+        touch(label, ids, ts)
 
+    # Arrows whose binding points at the shape are rerouted; any other arrow
+    # listed in its boundElements is translated along with it.
+    shape_id = shape.get("id")
     for item in shape.get("boundElements") or []:
         if item.get("type") != "arrow":
             continue
         arrow = id_index.get(item.get("id"))
-        if not arrow or arrow.get("id") in moved_arrow_ids or arrow.get("isDeleted"):
+        if not arrow or arrow.get("isDeleted") or arrow.get("id") in moved_arrow_ids:
             continue
+        moved_arrow_ids.add(arrow["id"])
+
+        start_binding = arrow.get("startBinding")
+        end_binding = arrow.get("endBinding")
+        bound = (start_binding and start_binding.get("elementId") == shape_id) or (
+            end_binding and end_binding.get("elementId") == shape_id
+        )
+        if bound and reroute_arrow(arrow, id_index):
+            touch(arrow, ids, ts)
+            continue
+
         arrow["x"] = float(arrow.get("x", 0)) + dx
         arrow["y"] = float(arrow.get("y", 0)) + dy
-        touch(arrow, ids)
+        touch(arrow, ids, ts)
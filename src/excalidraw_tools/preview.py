@@ -7,18 +7,50 @@ import argparse
 import json
 import sys
 from pathlib import Path
-from typing import Any, Dict, Sequence
+from typing import Any, List, Optional, Sequence, Tuple
 
 
-def _draw_arrow(ax: Any, elem: Dict[str, Any], stroke: str, line_width: float, linestyle: str) -> None:
-    points = elem.get("points") or []
-    if len(points) < 2:
-        return
+class _LineBatch:
+    """Polylines collected during the element pass and drawn as one LineCollection."""
+
+    def __init__(self) -> None:
+        self.segments: List[Any] = []
+        self.colors: List[str] = []
+        self.widths: List[float] = []
+        self.styles: List[str] = []
+
+    def add(self, xs: Sequence[float], ys: Sequence[float], color: str, width: float, style: str = "-") -> None:
+        self.add_array(list(zip(xs, ys)), color, width, style)
+
+    def add_array(self, points: Any, color: str, width: float, style: str = "-") -> None:
+        """Add a polyline given as an (N, 2) sequence or ndarray of absolute points."""
+        self.segments.append(points)
+        self.colors.append(color)
+        self.widths.append(width)
+        self.styles.append(style)
+
+
+def _point_array(np: Any, points: Sequence[Any], x: float, y: float) -> Any:
+    """Absolute (N, 2) float array for an element's relative points."""
+    try:
+        arr = np.asarray(points, dtype=float)
+    except (TypeError, ValueError):
+        # Ragged or otherwise irregular point lists: coerce point by point.
+        arr = np.array([[float(p[0]), float(p[1])] for p in points])
+    return arr[:, :2] + (x, y)
+
 
-    x = float(elem.get("x", 0))
-    y = float(elem.get("y", 0))
-    xs = [x + float(p[0]) for p in points]
-    ys = [y + float(p[1]) for p in points]
+def _draw_arrow(
+    ax: Any,
+    lines: _LineBatch,
+    xs: Sequence[float],
+    ys: Sequence[float],
+    stroke: str,
+    line_width: float,
+    linestyle: str,
+) -> None:
+    if len(xs) < 2:
+        return
 
     for idx in range(len(xs) - 1):
         if idx == len(xs) - 2:
@@ -29,31 +61,43 @@ def _draw_arrow(ax: Any, elem: Dict[str, Any], stroke: str, line_width: float, l
                 arrowprops={"arrowstyle": "->", "color": stroke, "lw": line_width},
             )
         else:
-            ax.plot(
-                [xs[idx], xs[idx + 1]],
-                [ys[idx], ys[idx + 1]],
-                color=stroke,
-                linewidth=line_width,
-                linestyle=linestyle,
-            )
+            lines.add(xs[idx : idx + 2], ys[idx : idx + 2], stroke, line_width, linestyle)
+
+
+# (plt, patches, np, LineCollection, PatchCollection), filled in by the first _mpl() call.
+_MPL: Optional[Tuple[Any, ...]] = None
+
+
+def _mpl() -> Tuple[Any, ...]:
+    """Import matplotlib and select the Agg backend once per process."""
+    global _MPL
+    if _MPL is None:
+        try:
+            import matplotlib
+            matplotlib.use("Agg")
+            import matplotlib.patches as patches
+            import matplotlib.pyplot as plt
+            import numpy as np
+            from matplotlib.collections import LineCollection, PatchCollection
+        except ImportError as exc:
+            raise RuntimeError(
+                f"matplotlib is required for preview rendering: {exc}\n"
+                "Install with: pip install excalidraw-tools[preview]"
+            ) from exc
+        _MPL = (plt, patches, np, LineCollection, PatchCollection)
+    return _MPL
 
 
 def render(in_path: Path, out_path: Path, dpi: int = 150) -> None:
-    try:
-        import matplotlib
-        matplotlib.use("Agg")
-        import matplotlib.patches as patches
-        import matplotlib.pyplot as plt
-    except ImportError as exc:
-        raise RuntimeError(
-            f"matplotlib is required for preview rendering: {exc}\n"
-            "Install with: pip install excalidraw-tools[preview]"
-        ) from exc
+    plt, patches, np, LineCollection, PatchCollection = _mpl()
 
     data = json.loads(in_path.read_text(encoding="utf-8"))
     elements = data.get("elements", [])
 
     fig, ax = plt.subplots(1, 1, figsize=(14, 10))
+    # Shapes and line work are drawn as one collection each, in element order.
+    shape_patches: List[Any] = []
+    lines = _LineBatch()
     min_x = float("inf")
     min_y = float("inf")
     max_x = float("-inf")
@@ -66,20 +110,33 @@ def render(in_path: Path, out_path: Path, dpi: int = 150) -> None:
         max_x = max(max_x, px)
         max_y = max(max_y, py)
 
+    def include_all(xs: Sequence[float], ys: Sequence[float]) -> None:
+        include(min(xs), min(ys))
+        include(max(xs), max(ys))
+
+    def include_array(pts: Any) -> None:
+        lo = pts.min(axis=0)
+        hi = pts.max(axis=0)
+        include(float(lo[0]), float(lo[1]))
+        include(float(hi[0]), float(hi[1]))
+
     for elem in elements:
-        if not isinstance(elem, dict) or elem.get("isDeleted"):
+        if type(elem) is not dict:
+            continue
+        g = elem.get
+        if g("isDeleted"):
             continue
 
-        etype = elem.get("type")
-        x = float(elem.get("x", 0))
-        y = float(elem.get("y", 0))
-        width = float(elem.get("width", 0))
-        height = float(elem.get("height", 0))
+        etype = g("type")
+        x = float(g("x", 0))
+        y = float(g("y", 0))
+        width = float(g("width", 0))
+        height = float(g("height", 0))
 
-        background = elem.get("backgroundColor", "none")
-        stroke = elem.get("strokeColor", "#1e1e1e")
-        style = elem.get("strokeStyle", "solid")
-        line_width = float(elem.get("strokeWidth", 2))
+        background = g("backgroundColor", "none")
+        stroke = g("strokeColor", "#1e1e1e")
+        style = g("strokeStyle", "solid")
+        line_width = float(g("strokeWidth", 2))
         linestyle = "--" if style == "dashed" else "-"
         face_color = background if background != "transparent" else "none"
 
@@ -96,7 +153,7 @@ def render(in_path: Path, out_path: Path, dpi: int = 150) -> None:
                 facecolor=face_color,
                 linestyle=linestyle,
             )
-            ax.add_patch(rect)
+            shape_patches.append(rect)
         elif etype == "ellipse":
             include(x, y)
             include(x + width, y + height)
@@ -109,7 +166,7 @@ def render(in_path: Path, out_path: Path, dpi: int = 150) -> None:
                 facecolor=face_color,
                 linestyle=linestyle,
             )
-            ax.add_patch(ell)
+            shape_patches.append(ell)
         elif etype == "diamond":
             include(x, y)
             include(x + width, y + height)
@@ -122,34 +179,33 @@ def render(in_path: Path, out_path: Path, dpi: int = 150) -> None:
                 facecolor=face_color,
                 linestyle=linestyle,
             )
-            ax.add_patch(poly)
+            shape_patches.append(poly)
         elif etype == "arrow":
-            arrow_points = elem.get("points") or []
-            for point in arrow_points:
-                if isinstance(point, list) and len(point) == 2:
-                    include(x + float(point[0]), y + float(point[1]))
-            _draw_arrow(ax, elem, stroke, line_width, linestyle)
+            arrow_points = [
+                point for point in g("points") or [] if isinstance(point, list) and len(point) == 2
+            ]
+            if arrow_points:
+                xs = [x + float(p[0]) for p in arrow_points]
+                ys = [y + float(p[1]) for p in arrow_points]
+                include_all(xs, ys)
+                _draw_arrow(ax, lines, xs, ys, stroke, line_width, linestyle)
         elif etype == "line":
-            line_points = elem.get("points") or []
+            line_points = g("points") or []
             if len(line_points) >= 2:
-                xs = [x + float(p[0]) for p in line_points]
-                ys = [y + float(p[1]) for p in line_points]
-                for px, py in zip(xs, ys):
-                    include(px, py)
-                ax.plot(xs, ys, color=stroke, linewidth=line_width, linestyle=linestyle)
+                pts = _point_array(np, line_points, x, y)
+                include_array(pts)
+                lines.add_array(pts, stroke, line_width, linestyle)
         elif etype == "freedraw":
-            fd_points = elem.get("points") or []
+            fd_points = g("points") or []
             if len(fd_points) >= 2:
-                xs = [x + float(p[0]) for p in fd_points]
-                ys = [y + float(p[1]) for p in fd_points]
-                for px, py in zip(xs, ys):
-                    include(px, py)
-                ax.plot(xs, ys, color=stroke, linewidth=max(1, line_width * 0.75))
+                pts = _point_array(np, fd_points, x, y)
+                include_array(pts)
+                lines.add_array(pts, stroke, max(1, line_width * 0.75))
         elif etype == "text":
             include(x, y)
             include(x + width, y + height)
-            font_size = float(elem.get("fontSize", 16))
-            text = str(elem.get("text", ""))
+            font_size = float(g("fontSize", 16))
+            text = str(g("text", ""))
             ax.text(
                 x + width / 2,
                 y + height / 2,
@@ -161,6 +217,20 @@ def render(in_path: Path, out_path: Path, dpi: int = 150) -> None:
                 color=stroke,
             )
 
+    if shape_patches:
+        ax.add_collection(PatchCollection(shape_patches, match_original=True))
+    if lines.segments:
+        ax.add_collection(
+            LineCollection(
+                lines.segments,
+                colors=lines.colors,
+                linewidths=lines.widths,
+                linestyles=lines.styles,
+                capstyle="projecting",
+                joinstyle="round",
+            )
+        )
+
     if min_x != float("inf") and min_y != float("inf"):
         padding = 40
         ax.set_xlim(min_x - padding, max_x + padding)
@@ -3,12 +3,12 @@
 
 from __future__ import annotations
 
-import json
+from operator import itemgetter
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Sequence, Tuple
 
+from excalidraw_tools._json import dumps_pretty, loads
 from excalidraw_tools.lib import (
-    active_elements,
     arrow_endpoints,
     build_id_index,
     infer_edge_by_proximity,
@@ -16,9 +16,12 @@ from excalidraw_tools.lib import (
     load_diagram,
 )
 
-NODE_TYPES = {"rectangle", "ellipse", "diamond"}
+NODE_TYPES = frozenset({"rectangle", "ellipse", "diamond"})
 DEFAULT_NODE_STROKE = "#1e1e1e"
 DEFAULT_NODE_BACKGROUND = "transparent"
+DEFAULT_NODE_STROKE_WIDTH = 2
+DEFAULT_NODE_STROKE_STYLE = "solid"
+DEFAULT_NODE_ROUGHNESS = 1
 DEFAULT_EDGE_STROKE = "#1e1e1e"
 
 
@@ -43,34 +46,40 @@ def resolve_spec_path(diagram_path: Path, value: Optional[str]) -> Optional[Path
 
 
 def _load_existing_spec(path: Path) -> Optional[Dict[str, Any]]:
-    if not path.exists():
-        return None
     try:
-        return json.loads(path.read_text(encoding="utf-8"))
+        return loads(path.read_bytes())
     except Exception:
         return None
 
 
-def _find_bound_labels(elements: Sequence[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
-    labels: Dict[str, Dict[str, Any]] = {}
-    for elem in active_elements(elements):
-        if elem.get("type") != "text":
-            continue
-        container_id = elem.get("containerId")
-        if isinstance(container_id, str) and container_id:
-            labels[container_id] = elem
-    return labels
-
+def _partition_elements(
+    elements: Sequence[Dict[str, Any]],
+) -> Tuple[List[Dict[str, Any]], Dict[str, Dict[str, Any]], List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Split live elements into (shapes, container id -> bound text, standalone texts, arrows).
 
-def _standalone_texts(elements: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
-    out: List[Dict[str, Any]] = []
-    for elem in active_elements(elements):
-        if elem.get("type") != "text":
-            continue
-        if elem.get("containerId"):
+    One sweep over the document replaces a separate filtering pass per consumer;
+    each list keeps document order.
+    """
+    shapes: List[Dict[str, Any]] = []
+    labels: Dict[str, Dict[str, Any]] = {}
+    standalone: List[Dict[str, Any]] = []
+    arrows: List[Dict[str, Any]] = []
+    node_types = NODE_TYPES
+    for elem in elements:
+        if elem.get("isDeleted"):
             continue
-        out.append(elem)
-    return out
+        etype = elem.get("type")
+        if etype in node_types:
+            shapes.append(elem)
+        elif etype == "arrow":
+            arrows.append(elem)
+        elif etype == "text":
+            container_id = elem.get("containerId")
+            if not container_id:
+                standalone.append(elem)
+            elif isinstance(container_id, str):
+                labels[container_id] = elem
+    return shapes, labels, standalone, arrows
 
 
 def _text_center(text: Dict[str, Any]) -> Tuple[float, float]:
@@ -81,83 +90,116 @@ def _text_center(text: Dict[str, Any]) -> Tuple[float, float]:
     return x + w / 2, y + h / 2
 
 
-def _extract_node(shape: Dict[str, Any], label: Optional[str]) -> Dict[str, Any]:
+def _extract_node(shape: Dict[str, Any], label: Optional[str]) -> Tuple[Tuple[float, float, str], Dict[str, Any]]:
+    """Return ``((y, x, id), node)``: the node's sort key alongside the spec dict."""
+    norm = _normalize_number
+    get = shape.get
+    node_id = str(shape["id"])
+    node_type = str(shape["type"])
+    x = float(get("x", 0))
+    y = float(get("y", 0))
     node: Dict[str, Any] = {
-        "id": str(shape["id"]),
-        "type": str(shape["type"]),
-        "x": _normalize_number(float(shape.get("x", 0))),
-        "y": _normalize_number(float(shape.get("y", 0))),
-        "width": _normalize_number(float(shape.get("width", 0))),
-        "height": _normalize_number(float(shape.get("height", 0))),
+        "id": node_id,
+        "type": node_type,
+        "x": norm(x),
+        "y": norm(y),
+        "width": norm(float(get("width", 0))),
+        "height": norm(float(get("height", 0))),
     }
 
-    stroke = str(shape.get("strokeColor", DEFAULT_NODE_STROKE))
-    background = str(shape.get("backgroundColor", DEFAULT_NODE_BACKGROUND))
+    stroke = get("strokeColor", DEFAULT_NODE_STROKE)
     if stroke != DEFAULT_NODE_STROKE:
-        node["stroke"] = stroke
+        node["stroke"] = str(stroke)
+    background = get("backgroundColor", DEFAULT_NODE_BACKGROUND)
     if background != DEFAULT_NODE_BACKGROUND:
-        node["background"] = background
-
-    stroke_width = int(shape.get("strokeWidth", 2))
-    stroke_style = str(shape.get("strokeStyle", "solid"))
-    roughness = int(shape.get("roughness", 1))
-    if stroke_width != 2:
-        node["strokeWidth"] = stroke_width
-    if stroke_style != "solid":
-        node["strokeStyle"] = stroke_style
-    if roughness != 1:
-        node["roughness"] = roughness
+        node["background"] = str(background)
+
+    # Numeric fields are int()-coerced before the emit check, so values such as
+    # "2" or 2.5 still truncate to the default.
+    stroke_width = get("strokeWidth", DEFAULT_NODE_STROKE_WIDTH)
+    if stroke_width != DEFAULT_NODE_STROKE_WIDTH:
+        stroke_width = int(stroke_width)
+        if stroke_width != DEFAULT_NODE_STROKE_WIDTH:
+            node["strokeWidth"] = stroke_width
+    stroke_style = get("strokeStyle", DEFAULT_NODE_STROKE_STYLE)
+    if stroke_style != DEFAULT_NODE_STROKE_STYLE:
+        node["strokeStyle"] = str(stroke_style)
+    roughness = get("roughness", DEFAULT_NODE_ROUGHNESS)
+    if roughness != DEFAULT_NODE_ROUGHNESS:
+        roughness = int(roughness)
+        if roughness != DEFAULT_NODE_ROUGHNESS:
+            node["roughness"] = roughness
 
     if label:
         node["label"] = label
-    return node
+    return (y, x, node_id), node
 
 
-def _infer_arrow_label(
-    arrow: Dict[str, Any],
-    standalone_texts: Sequence[Dict[str, Any]],
-    used_ids: set[str],
-    *,
-    max_distance: float = 64.0,
-) -> Optional[str]:
-    start, end = arrow_endpoints(arrow)
-    midpoint = ((start[0] + end[0]) / 2, (start[1] + end[1]) / 2)
+# (slot, center x, center y, stripped text). Texts sharing an id share a slot, so
+# using one as a label retires all of them.
+_LabelCandidate = Tuple[int, float, float, str]
+
 
-    best: Optional[Tuple[float, Dict[str, Any]]] = None
+def _label_candidates(standalone_texts: Sequence[Dict[str, Any]]) -> Tuple[List[_LabelCandidate], List[bool]]:
+    """Candidates for arrow labels plus an all-True availability flag per slot."""
+    out: List[_LabelCandidate] = []
+    slots: Dict[str, int] = {}
     for text in standalone_texts:
         text_id = str(text.get("id", ""))
-        if not text_id or text_id in used_ids:
+        if not text_id:
             continue
         cx, cy = _text_center(text)
-        dist = ((cx - midpoint[0]) ** 2 + (cy - midpoint[1]) ** 2) ** 0.5
-        if dist > max_distance:
+        slot = slots.setdefault(text_id, len(slots))
+        out.append((slot, cx, cy, str(text.get("text", "")).strip()))
+    return out, [True] * len(slots)
+
+
+def _infer_arrow_label(
+    midpoint: Tuple[float, float],
+    candidates: Sequence[_LabelCandidate],
+    available: List[bool],
+    *,
+    max_distance: float = 64.0,
+) -> Optional[str]:
+    mx, my = midpoint
+    limit = max_distance * max_distance
+    best: Optional[Tuple[float, int, str]] = None
+    for slot, cx, cy, label in candidates:
+        if not available[slot]:
+            continue
+        dx = cx - mx
+        dy = cy - my
+        dist2 = dx * dx + dy * dy
+        if dist2 > limit:
             continue
-        if best is None or dist < best[0]:
-            best = (dist, text)
+        if best is None or dist2 < best[0]:
+            best = (dist2, slot, label)
 
     if best is None:
         return None
 
-    _, text = best
-    text_id = str(text.get("id", ""))
-    if text_id:
-        used_ids.add(text_id)
-    label = str(text.get("text", "")).strip()
+    _, slot, label = best
+    available[slot] = False
     return label or None
 
 
 def _extract_edges(
-    elements: Sequence[Dict[str, Any]],
+    arrows: Sequence[Dict[str, Any]],
     id_index: Dict[str, Dict[str, Any]],
     standalone_texts: Sequence[Dict[str, Any]],
 ) -> List[Dict[str, Any]]:
     edges: List[Dict[str, Any]] = []
-    used_text_ids: set[str] = set()
-
-    for elem in active_elements(elements):
-        if elem.get("type") != "arrow":
-            continue
-
+    sort_keys: List[Tuple[float, float, float, float, str, str]] = []
+    # Node id -> (y, x) for edge sort keys.
+    positions: Dict[str, Tuple[float, float]] = {}
+    candidates: List[_LabelCandidate] = []
+    available: Optional[List[bool]] = None
+    node_types = NODE_TYPES
+    endpoints = arrow_endpoints
+    edge_from_fixed_point = infer_edge_from_fixed_point
+    edge_by_proximity = infer_edge_by_proximity
+
+    for elem in arrows:
         start_binding = elem.get("startBinding") or {}
         end_binding = elem.get("endBinding") or {}
         start_id = start_binding.get("elementId")
@@ -167,12 +209,12 @@ def _extract_edges(
 
         source = id_index[start_id]
         target = id_index[end_id]
-        if source.get("type") not in NODE_TYPES or target.get("type") not in NODE_TYPES:
+        if source.get("type") not in node_types or target.get("type") not in node_types:
             continue
 
-        start_pt, end_pt = arrow_endpoints(elem)
-        from_edge = infer_edge_from_fixed_point(start_binding) or infer_edge_by_proximity(source, start_pt)
-        to_edge = infer_edge_from_fixed_point(end_binding) or infer_edge_by_proximity(target, end_pt)
+        start_pt, end_pt = endpoints(elem)
+        from_edge = edge_from_fixed_point(start_binding) or edge_by_proximity(source, start_pt)
+        to_edge = edge_from_fixed_point(end_binding) or edge_by_proximity(target, end_pt)
 
         edge: Dict[str, Any] = {
             "from": str(start_id),
@@ -188,47 +230,45 @@ def _extract_edges(
         if bool(elem.get("elbowed")):
             edge["elbowed"] = True
 
-        label = _infer_arrow_label(elem, standalone_texts, used_text_ids)
+        if available is None:
+            candidates, available = _label_candidates(standalone_texts)
+        midpoint = ((start_pt[0] + end_pt[0]) / 2, (start_pt[1] + end_pt[1]) / 2)
+        label = _infer_arrow_label(midpoint, candidates, available)
         if label:
             edge["label"] = label
 
         edges.append(edge)
+        source_pos = positions.get(start_id)
+        if source_pos is None:
+            source_pos = positions[start_id] = (float(source.get("y", 0)), float(source.get("x", 0)))
+        target_pos = positions.get(end_id)
+        if target_pos is None:
+            target_pos = positions[end_id] = (float(target.get("y", 0)), float(target.get("x", 0)))
+        sort_keys.append((*source_pos, *target_pos, edge["from"], edge["to"]))
 
-    def edge_sort_key(edge: Dict[str, Any]) -> Tuple[float, float, float, float, str, str]:
-        source = id_index[edge["from"]]
-        target = id_index[edge["to"]]
-        return (
-            float(source.get("y", 0)),
-            float(source.get("x", 0)),
-            float(target.get("y", 0)),
-            float(target.get("x", 0)),
-            edge["from"],
-            edge["to"],
-        )
-
-    edges.sort(key=edge_sort_key)
-    return edges
+    order = sorted(range(len(edges)), key=sort_keys.__getitem__)
+    return [edges[i] for i in order]
 
 
 def diagram_to_spec(data: Dict[str, Any], existing_spec: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
     elements = data.get("elements", [])
     id_index = build_id_index(elements)
-    labels = _find_bound_labels(elements)
+    shapes, labels, standalone, arrows = _partition_elements(elements)
 
-    nodes: List[Dict[str, Any]] = []
-    for elem in active_elements(elements):
-        if elem.get("type") not in NODE_TYPES:
-            continue
-        label_elem = labels.get(str(elem.get("id")))
+    records: List[Tuple[Tuple[float, float, str], Dict[str, Any]]] = []
+    for elem in shapes:
+        # Labels are keyed by raw containerId strings; Excalidraw ids are strings,
+        # so the shape's id can be used as-is.
+        label_elem = labels.get(elem.get("id"))
         label = None
         if label_elem:
             label = str(label_elem.get("text", "")).strip() or None
-        nodes.append(_extract_node(elem, label))
+        records.append(_extract_node(elem, label))
 
-    nodes.sort(key=lambda n: (float(n.get("y", 0)), float(n.get("x", 0)), n["id"]))
+    records.sort(key=itemgetter(0))
+    nodes = [node for _, node in records]
 
-    standalone = _standalone_texts(elements)
-    edges = _extract_edges(elements, id_index, standalone)
+    edges = _extract_edges(arrows, id_index, standalone)
 
     spec: Dict[str, Any] = {
         "seed": int((existing_spec or {}).get("seed", 42)),
@@ -244,9 +284,7 @@ def diagram_to_spec(data: Dict[str, Any], existing_spec: Optional[Dict[str, Any]
 
 def write_spec(spec_path: Path, spec: Dict[str, Any]) -> None:
     spec_path.parent.mkdir(parents=True, exist_ok=True)
-    with open(spec_path, "w", encoding="utf-8") as f:
-        json.dump(spec, f, indent=2)
-        f.write("\n")
+    spec_path.write_bytes(dumps_pretty(spec))
 
 
 def sync_spec_for_diagram(diagram_path: Path, spec_path: Optional[Path] = None) -> Path:
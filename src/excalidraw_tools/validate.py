@@ -4,11 +4,12 @@
 from __future__ import annotations
 
 import argparse
-import json
+import os
 import sys
 from pathlib import Path
-from typing import Any, Dict, List, Sequence, Tuple
+from typing import AbstractSet, Any, Dict, FrozenSet, List, Sequence, Set, Tuple
 
+from excalidraw_tools._json import loads
 from excalidraw_tools.lib import (
     ARROW_REQUIRED_FIELDS,
     BASE_REQUIRED_FIELDS,
@@ -19,36 +20,38 @@ from excalidraw_tools.lib import (
 ROOT_REQUIRED_FIELDS = {"type", "version", "source", "elements", "appState", "files"}
 SUPPORTED_TYPES = {"rectangle", "ellipse", "diamond", "arrow", "line", "text", "freedraw"}
 
-
-def _is_number(value: Any) -> bool:
-    return isinstance(value, (int, float)) and not isinstance(value, bool)
+# Below this much total input, worker-process startup costs more than parsing
+# the files serially.
+PARALLEL_MIN_BYTES = 8 * 1024 * 1024
 
 
 def _validate_point(point: Any) -> bool:
-    return (
-        isinstance(point, list)
-        and len(point) == 2
-        and _is_number(point[0])
-        and _is_number(point[1])
-    )
+    # Exact type checks: JSON decoders only produce plain list/int/float, and
+    # type(...) is int already rejects bool (a subclass of int).
+    if type(point) is not list or len(point) != 2:
+        return False
+    x, y = point
+    return (type(x) is int or type(x) is float) and (type(y) is int or type(y) is float)
 
 
-def _bound_contains(parent: Dict[str, Any], child_id: str, child_type: str) -> bool:
-    bound = parent.get("boundElements")
-    if not isinstance(bound, list):
-        return False
-    for item in bound:
-        if not isinstance(item, dict):
-            continue
-        if item.get("id") == child_id and item.get("type") == child_type:
-            return True
-    return False
+_NO_BOUND: FrozenSet[Tuple[str, str]] = frozenset()
+
+
+def _bound_keys(bound: Any) -> AbstractSet[Tuple[str, str]]:
+    """(id, type) pairs listed in a boundElements value, for O(1) membership tests."""
+    if not bound or not isinstance(bound, list):
+        return _NO_BOUND
+    return {
+        (item["id"], item["type"])
+        for item in bound
+        if isinstance(item, dict) and isinstance(item.get("id"), str) and isinstance(item.get("type"), str)
+    }
 
 
 def validate_document(data: Dict[str, Any]) -> List[str]:
     errors: List[str] = []
 
-    missing_root = sorted(ROOT_REQUIRED_FIELDS - set(data.keys()))
+    missing_root = sorted(k for k in ROOT_REQUIRED_FIELDS if k not in data)
     if missing_root:
         errors.append(f"missing root keys: {', '.join(missing_root)}")
 
@@ -60,55 +63,67 @@ def validate_document(data: Dict[str, Any]) -> List[str]:
         errors.append("root.elements must be a list")
         return errors
 
-    ids: List[str] = []
     id_index: Dict[str, Dict[str, Any]] = {}
+    duplicates: Set[str] = set()
+    # Parent id -> (child id, child type) pairs from its boundElements, for the
+    # element id_index resolves to.
+    bound_index: Dict[str, AbstractSet[Tuple[str, str]]] = {}
+    # Text and arrow elements, in document order; their reference checks need
+    # the complete id_index, so they run after the main pass.
+    linked: List[Tuple[int, Dict[str, Any]]] = []
 
     for idx, elem in enumerate(elements):
-        prefix = f"elements[{idx}]"
         if not isinstance(elem, dict):
-            errors.append(f"{prefix} must be an object")
+            errors.append(f"elements[{idx}] must be an object")
             continue
 
         elem_id = elem.get("id")
         if not isinstance(elem_id, str) or not elem_id:
-            errors.append(f"{prefix}.id must be a non-empty string")
+            errors.append(f"elements[{idx}].id must be a non-empty string")
         else:
-            ids.append(elem_id)
+            if elem_id in id_index:
+                duplicates.add(elem_id)
             id_index[elem_id] = elem
 
-        missing = sorted(BASE_REQUIRED_FIELDS - set(elem.keys()))
-        if missing:
-            errors.append(f"{prefix} missing base keys: {', '.join(missing)}")
+        if not elem.keys() >= BASE_REQUIRED_FIELDS:
+            missing = sorted(k for k in BASE_REQUIRED_FIELDS if k not in elem)
+            errors.append(f"elements[{idx}] missing base keys: {', '.join(missing)}")
 
         elem_type = elem.get("type")
         if elem_type not in SUPPORTED_TYPES:
-            errors.append(f"{prefix}.type unsupported: {elem_type}")
+            errors.append(f"elements[{idx}].type unsupported: {elem_type}")
 
         if elem_type in ROUNDNESS_BY_TYPE and "roundness" in elem:
             expected = ROUNDNESS_BY_TYPE[elem_type]
             if expected is None:
                 if elem["roundness"] is not None:
-                    errors.append(f"{prefix}.roundness should be null for {elem_type}")
+                    errors.append(f"elements[{idx}].roundness should be null for {elem_type}")
             elif elem["roundness"] != expected:
-                errors.append(f"{prefix}.roundness should be {expected} for {elem_type}")
+                errors.append(f"elements[{idx}].roundness should be {expected} for {elem_type}")
 
         bound = elem.get("boundElements")
         if bound is not None and not isinstance(bound, list):
-            errors.append(f"{prefix}.boundElements must be list or null")
+            errors.append(f"elements[{idx}].boundElements must be list or null")
+        if isinstance(elem_id, str) and elem_id:
+            bound_index[elem_id] = _bound_keys(bound)
+
+        if elem_type == "text" or elem_type == "arrow":
+            linked.append((idx, elem))
 
-    duplicates = sorted({eid for eid in ids if ids.count(eid) > 1})
     if duplicates:
-        errors.append(f"duplicate element ids: {', '.join(duplicates)}")
+        errors.append(f"duplicate element ids: {', '.join(sorted(duplicates))}")
 
-    for idx, elem in enumerate(elements):
-        if not isinstance(elem, dict):
-            continue
+    for idx, elem in linked:
         prefix = f"elements[{idx}] ({elem.get('id', 'unknown')})"
         elem_type = elem.get("type")
+        child_id = elem.get("id")
+        if not isinstance(child_id, str):
+            # Already reported above; a non-string id cannot match a bound entry.
+            child_id = None
 
         if elem_type == "text":
-            missing = sorted(TEXT_REQUIRED_FIELDS - set(elem.keys()))
-            if missing:
+            if not elem.keys() >= TEXT_REQUIRED_FIELDS:
+                missing = sorted(k for k in TEXT_REQUIRED_FIELDS if k not in elem)
                 errors.append(f"{prefix} missing text keys: {', '.join(missing)}")
 
             container_id = elem.get("containerId")
@@ -116,21 +131,25 @@ def validate_document(data: Dict[str, Any]) -> List[str]:
                 parent = id_index.get(container_id)
                 if parent is None:
                     errors.append(f"{prefix}.containerId references missing element: {container_id}")
-                elif not _bound_contains(parent, elem.get("id"), "text"):
+                elif (child_id, "text") not in bound_index[container_id]:
                     errors.append(
                         f"{prefix} container {container_id} does not reference this text in boundElements"
                     )
-
-        if elem_type == "arrow":
-            missing = sorted(ARROW_REQUIRED_FIELDS - set(elem.keys()))
-            if missing:
+        else:
+            if not elem.keys() >= ARROW_REQUIRED_FIELDS:
+                missing = sorted(k for k in ARROW_REQUIRED_FIELDS if k not in elem)
                 errors.append(f"{prefix} missing arrow keys: {', '.join(missing)}")
 
             points = elem.get("points")
             if not isinstance(points, list) or len(points) < 2:
                 errors.append(f"{prefix}.points must contain at least two points")
-            elif any(not _validate_point(p) for p in points):
-                errors.append(f"{prefix}.points must be [x, y] number pairs")
+            else:
+                for point_idx, point in enumerate(points):
+                    if not _validate_point(point):
+                        errors.append(
+                            f"{prefix}.points must be [x, y] number pairs (first invalid: points[{point_idx}])"
+                        )
+                        break
 
             for binding_key in ("startBinding", "endBinding"):
                 binding = elem.get(binding_key)
@@ -153,7 +172,7 @@ def validate_document(data: Dict[str, Any]) -> List[str]:
                 parent = id_index.get(target_id)
                 if parent is None:
                     continue
-                if not _bound_contains(parent, elem.get("id"), "arrow"):
+                if (child_id, "arrow") not in bound_index[target_id]:
                     errors.append(
                         f"{prefix} {side} target {target_id} does not reference this arrow in boundElements"
                     )
@@ -163,7 +182,7 @@ def validate_document(data: Dict[str, Any]) -> List[str]:
 
 def validate_file(path: Path) -> Tuple[bool, List[str]]:
     try:
-        data = json.loads(path.read_text(encoding="utf-8"))
+        data = loads(path.read_bytes())
     except Exception as exc:
         return False, [f"{path}: failed to parse JSON: {exc}"]
 
@@ -173,10 +192,29 @@ def validate_file(path: Path) -> Tuple[bool, List[str]]:
     return True, [f"{path}: OK"]
 
 
+def _total_size(files: Sequence[Path]) -> int:
+    total = 0
+    for path in files:
+        try:
+            total += path.stat().st_size
+        except OSError:
+            pass  # validate_file reports unreadable paths
+    return total
+
+
 def _run(args: argparse.Namespace) -> int:
+    files: List[Path] = args.files
+    workers = min(len(files), os.cpu_count() or 1)
+    if workers > 1 and _total_size(files) >= PARALLEL_MIN_BYTES:
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(validate_file, files))
+    else:
+        results = [validate_file(path) for path in files]
+
     all_errors: List[str] = []
-    for path in args.files:
-        ok, messages = validate_file(path)
+    for ok, messages in results:
         if ok:
             print(messages[0])
         else: